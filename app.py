@@ -3,7 +3,6 @@ AI Document Assistant - Streamlit UI
 Modern RAG application with beautiful interface.
 """
 
-import os
 import sys
 import time
 import streamlit as st
@@ -150,22 +149,17 @@ def main():
         if uploaded_file is not None:
             if uploaded_file.name not in st.session_state.uploaded_files:
                 with st.spinner("📖 Processing document..."):
-                    # Save temporarily
-                    temp_path = f"/tmp/{uploaded_file.name}"
-                    with open(temp_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    
-                    # Ingest
-                    result = rag.ingest_document(temp_path)
-                    
-                    # Clean up
-                    os.remove(temp_path)
+                    # Ingest straight from the in-memory upload
+                    result = rag.ingest_document(uploaded_file)
                     
                     # Update state
                     st.session_state.uploaded_files.add(uploaded_file.name)
                     
-                    st.success(f"✅ {result['file_name']} uploaded successfully!")
-                    st.info(f"📊 Split into {result['chunks_created']} chunks")
+                    if result["status"] == "duplicate":
+                        st.info(f"ℹ️ {result['file_name']} is already uploaded")
+                    else:
+                        st.success(f"✅ {result['file_name']} uploaded successfully!")
+                        st.info(f"📊 Split into {result['chunks_created']} chunks")
                     
                     # Rerun to update stats
                     st.rerun()
@@ -225,21 +219,26 @@ def main():
         with st.chat_message("assistant"):
             try:
                 with st.spinner("🤔 Thinking..."):
-                    response = rag.query(prompt, stream=False)
-                    
-                    st.markdown(response["answer"])
-                    
-                    # Show sources
-                    if response["sources"]:
-                        with st.expander("📚 Sources"):
-                            for i, source in enumerate(response["sources"][:3]):
-                                st.caption(f"**Source {i+1}:** {source['metadata'].get('source', 'Unknown')}")
-                                st.text(source['content'][:200] + "...")
+                    response = rag.query(prompt, stream=True)
+                
+                # Render tokens as they arrive (cached answers come back whole)
+                if response["stream"]:
+                    answer = st.write_stream(response["answer"])
+                else:
+                    answer = response["answer"]
+                    st.markdown(answer)
+                
+                # Show sources
+                if response["sources"]:
+                    with st.expander("📚 Sources"):
+                        for i, source in enumerate(response["sources"][:3]):
+                            st.caption(f"**Source {i+1}:** {source['metadata'].get('source', 'Unknown')}")
+                            st.text(source['content'][:200] + "...")
                 
                 # Save assistant message
                 st.session_state.messages.append({
                     "role": "assistant",
-                    "content": response["answer"],
+                    "content": answer,
                     "sources": response["sources"]
                 })
                 
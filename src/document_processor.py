@@ -3,11 +3,25 @@ Document Processor Module
 Handles PDF and TXT file reading, text extraction, and intelligent chunking.
 """
 
+import io
 import os
-from typing import List, Dict
+import hashlib
+import threading
+from typing import List, Dict, Iterator, Union, BinaryIO
 from PyPDF2 import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PDFium is not thread-safe; all calls into it are serialized
+_PDFIUM_LOCK = threading.Lock()
+
+# A filesystem path or a binary file-like object (e.g. a Streamlit upload)
+FileInput = Union[str, os.PathLike, BinaryIO]
+
 
 class DocumentProcessor:
     """Process and chunk documents for RAG pipeline."""
@@ -29,60 +43,260 @@ class DocumentProcessor:
             separators=["\n\n", "\n", " ", ""]
         )
     
-    def read_pdf(self, file_path: str) -> str:
+    @staticmethod
+    def get_file_name(file_or_path: FileInput) -> str:
         """
-        Extract text from PDF file.
+        Get the base file name of a path or file-like object.
         
         Args:
-            file_path: Path to PDF file
+            file_or_path: File path or binary file-like object
             
         Returns:
-            Extracted text content
+            Base file name
+        """
+        if isinstance(file_or_path, (str, os.PathLike)):
+            return os.path.basename(file_or_path)
+        return os.path.basename(getattr(file_or_path, "name", ""))
+    
+    @staticmethod
+    def file_digest(file_or_path: FileInput) -> str:
+        """
+        Hash raw file content in 1 MiB blocks with BLAKE2b.
+        
+        Args:
+            file_or_path: File path or binary file-like object
+            
+        Returns:
+            128-bit hex digest
+        """
+        h = hashlib.blake2b(digest_size=16)
+        if isinstance(file_or_path, (str, os.PathLike)):
+            with open(file_or_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            file_or_path.seek(0)
+            for block in iter(lambda: file_or_path.read(1 << 20), b""):
+                h.update(block)
+            file_or_path.seek(0)
+        return h.hexdigest()
+    
+    @staticmethod
+    def _rewind(file_or_path: FileInput) -> FileInput:
+        """Seek file-like objects back to the start; paths pass through."""
+        if not isinstance(file_or_path, (str, os.PathLike)) and hasattr(file_or_path, "seek"):
+            file_or_path.seek(0)
+        return file_or_path
+    
+    def _iter_pdfium_pages(self, file_or_path: FileInput) -> Iterator[str]:
+        """
+        Yield text of each PDF page using PDFium's native extractor.
+        
+        Args:
+            file_or_path: Path to PDF file or binary file-like object
+            
+        Yields:
+            Page text followed by a newline
+        """
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(self._rewind(file_or_path))
+            num_pages = len(pdf)
+        try:
+            for index in range(num_pages):
+                with _PDFIUM_LOCK:
+                    page = pdf[index]
+                    try:
+                        textpage = page.get_textpage()
+                        try:
+                            text = textpage.get_text_range()
+                        finally:
+                            textpage.close()
+                    finally:
+                        page.close()
+                yield text.replace("\r\n", "\n") + "\n"
+        finally:
+            with _PDFIUM_LOCK:
+                pdf.close()
+    
+    def _iter_pdf_pages(self, file_or_path: FileInput) -> Iterator[str]:
+        """
+        Yield text of each PDF page.
+        
+        Uses pypdfium2 when installed and falls back to PyPDF2.
+        
+        Args:
+            file_or_path: Path to PDF file or binary file-like object
+            
+        Yields:
+            Page text followed by a newline
         """
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            if pdfium is not None:
+                yield from self._iter_pdfium_pages(file_or_path)
+            else:
+                reader = PdfReader(self._rewind(file_or_path))
+                for page in reader.pages:
+                    yield page.extract_text() + "\n"
         except Exception as e:
             raise ValueError(f"Error reading PDF file: {str(e)}")
     
-    def read_txt(self, file_path: str) -> str:
+    def _iter_txt_blocks(self, file_or_path: FileInput, block_size: int = 1 << 16) -> Iterator[str]:
         """
-        Read text from TXT file.
+        Yield TXT file content in blocks.
         
         Args:
-            file_path: Path to TXT file
+            file_or_path: Path to TXT file or binary file-like object
+            block_size: Characters per block
             
-        Returns:
-            File content
+        Yields:
+            File content blocks
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            if isinstance(file_or_path, (str, os.PathLike)):
+                with open(file_or_path, 'r', encoding='utf-8') as f:
+                    yield from iter(lambda: f.read(block_size), "")
+            else:
+                f = io.TextIOWrapper(self._rewind(file_or_path), encoding='utf-8')
+                try:
+                    yield from iter(lambda: f.read(block_size), "")
+                finally:
+                    f.detach()  # Leave the caller's stream open
         except Exception as e:
             raise ValueError(f"Error reading TXT file: {str(e)}")
     
-    def process_file(self, file_path: str) -> str:
+    def iter_text(self, file_or_path: FileInput) -> Iterator[str]:
         """
-        Process file based on extension.
+        Stream file text based on extension.
         
         Args:
-            file_path: Path to file
+            file_or_path: File path or binary file-like object with a name
             
-        Returns:
-            Extracted text
+        Yields:
+            Consecutive pieces of the extracted text
         """
-        ext = os.path.splitext(file_path)[1].lower()
+        ext = os.path.splitext(self.get_file_name(file_or_path))[1].lower()
         
         if ext == '.pdf':
-            return self.read_pdf(file_path)
+            return self._iter_pdf_pages(file_or_path)
         elif ext in ['.txt', '.md']:
-            return self.read_txt(file_path)
+            return self._iter_txt_blocks(file_or_path)
         else:
             raise ValueError(f"Unsupported file type: {ext}")
     
+    def read_pdf(self, file_or_path: FileInput) -> str:
+        """
+        Extract text from PDF file.
+        
+        Args:
+            file_or_path: Path to PDF file or binary file-like object
+            
+        Returns:
+            Extracted text content
+        """
+        return "".join(self._iter_pdf_pages(file_or_path))
+    
+    def read_txt(self, file_or_path: FileInput) -> str:
+        """
+        Read text from TXT file.
+        
+        Args:
+            file_or_path: Path to TXT file or binary file-like object
+            
+        Returns:
+            File content
+        """
+        return "".join(self._iter_txt_blocks(file_or_path))
+    
+    def process_file(self, file_or_path: FileInput) -> str:
+        """
+        Process file based on extension.
+        
+        Args:
+            file_or_path: File path or binary file-like object with a name
+            
+        Returns:
+            Extracted text
+        """
+        return "".join(self.iter_text(file_or_path))
+    
+    def iter_chunk_texts(self, file_or_path: FileInput) -> Iterator[str]:
+        """
+        Stream text chunks without materializing the full document text.
+        
+        Text is fed page by page into a rolling buffer; once the buffer
+        reaches twice the chunk size it is split, every chunk but the last
+        is emitted and the unfinished tail is kept for the next round.
+        
+        Args:
+            file_or_path: Path to document or binary file-like object
+            
+        Yields:
+            Text chunks
+        """
+        parts = []
+        buffered = 0
+        
+        for segment in self.iter_text(file_or_path):
+            parts.append(segment)
+            buffered += len(segment)
+            if buffered < 2 * self.chunk_size:
+                continue
+            
+            buffer = "".join(parts)
+            chunks = self.text_splitter.split_text(buffer)
+            if len(chunks) < 2:
+                parts = [buffer]
+                continue
+            
+            yield from chunks[:-1]
+            
+            # Keep the raw tail (with its trailing whitespace) for re-splitting
+            start = buffer.rfind(chunks[-1])
+            tail = buffer[start:] if start >= 0 else chunks[-1] + "\n"
+            parts = [tail]
+            buffered = len(tail)
+        
+        if parts:
+            yield from self.text_splitter.split_text("".join(parts))
+    
+    def _file_metadata(self, file_or_path: FileInput) -> Dict:
+        """
+        Build source metadata for a file.
+        
+        Args:
+            file_or_path: Path to document or binary file-like object
+            
+        Returns:
+            Metadata dictionary
+        """
+        file_name = self.get_file_name(file_or_path)
+        return {
+            "source": file_name,
+            "file_path": os.fspath(file_or_path) if isinstance(file_or_path, (str, os.PathLike)) else file_name,
+            "file_type": os.path.splitext(file_name)[1]
+        }
+    
+    def _build_documents(self, chunks: List[str], metadata: Dict = None) -> List[Dict]:
+        """
+        Wrap text chunks into documents with metadata.
+        
+        Args:
+            chunks: Text chunks
+            metadata: Additional metadata to attach
+            
+        Returns:
+            List of chunks with metadata
+        """
+        base = metadata or {}
+        total = len(chunks)
+        return [
+            {
+                "content": chunk,
+                "metadata": {"chunk_id": i, "total_chunks": total, **base}
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+    
     def chunk_text(self, text: str, metadata: Dict = None) -> List[Dict]:
         """
         Split text into chunks with metadata.
@@ -95,43 +309,38 @@ class DocumentProcessor:
             List of chunks with metadata
         """
         chunks = self.text_splitter.split_text(text)
+        return self._build_documents(chunks, metadata)
+    
+    def iter_documents(self, file_or_path: FileInput, metadata: Dict = None) -> Iterator[Dict]:
+        """
+        Stream chunks with metadata as the file is read.
         
-        documents = []
-        for i, chunk in enumerate(chunks):
-            doc = {
-                "content": chunk,
-                "metadata": {
-                    "chunk_id": i,
-                    "total_chunks": len(chunks),
-                    **(metadata or {})
-                }
-            }
-            documents.append(doc)
+        Unlike process_and_chunk, metadata has no total_chunks since the
+        count is unknown until the whole file has been read.
         
-        return documents
+        Args:
+            file_or_path: Path to document or binary file-like object
+            metadata: Additional metadata to attach
+            
+        Yields:
+            Document chunks with metadata
+        """
+        base = {**self._file_metadata(file_or_path), **(metadata or {})}
+        for i, chunk in enumerate(self.iter_chunk_texts(file_or_path)):
+            yield {"content": chunk, "metadata": {"chunk_id": i, **base}}
     
-    def process_and_chunk(self, file_path: str) -> List[Dict]:
+    def process_and_chunk(self, file_or_path: FileInput) -> List[Dict]:
         """
         Complete pipeline: read file and create chunks.
         
         Args:
-            file_path: Path to document
+            file_or_path: Path to document or binary file-like object
             
         Returns:
             List of document chunks with metadata
         """
-        # Extract text
-        text = self.process_file(file_path)
-        
-        # Create metadata
-        metadata = {
-            "source": os.path.basename(file_path),
-            "file_path": file_path,
-            "file_type": os.path.splitext(file_path)[1]
-        }
-        
-        # Chunk text
-        return self.chunk_text(text, metadata)
+        chunks = list(self.iter_chunk_texts(file_or_path))
+        return self._build_documents(chunks, self._file_metadata(file_or_path))
 
 
 if __name__ == "__main__":
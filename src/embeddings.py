@@ -0,0 +1,276 @@
+"""
+Embeddings Module
+Embedding model wrappers used by the vector store.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+import numpy as np
+
+from sentence_transformers import SentenceTransformer
+
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+
+class SentenceTransformerEmbeddings:
+    """Sentence-transformer embeddings returned as float32 NumPy arrays."""
+
+    def __init__(self, model_name: str, device: str = "cpu", batch_size: int = 32):
+        """
+        Initialize sentence-transformer embeddings.
+
+        Args:
+            model_name: HuggingFace sentence-transformer model name
+            device: Torch device to run on
+            batch_size: Max texts per forward pass
+        """
+        self.model = SentenceTransformer(model_name, device=device)
+        self.batch_size = batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into unit-length float32 vectors."""
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of documents.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embed a single query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Float32 query embedding
+        """
+        return self._encode([text])[0]
+
+
+class OnnxEmbeddings:
+    """Int8-quantized sentence-transformer served by ONNX Runtime."""
+
+    QUANTIZED_FILE = "model_quantized.onnx"
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str,
+        batch_size: int = 32,
+        max_length: int = 256
+    ):
+        """
+        Initialize ONNX embeddings, exporting and quantizing on first use.
+
+        Args:
+            model_name: HuggingFace sentence-transformer model name
+            cache_dir: Directory to store the quantized model
+            batch_size: Max texts per inference call
+            max_length: Max tokens per text
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("OnnxEmbeddings requires optimum[onnxruntime]")
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.model_dir = os.path.join(
+            cache_dir, model_name.replace("/", "__") + "-int8"
+        )
+
+        model_path = os.path.join(self.model_dir, self.QUANTIZED_FILE)
+        if not os.path.exists(model_path):
+            self._export_quantized()
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _export_quantized(self):
+        """Export the model to ONNX and apply dynamic int8 quantization."""
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            self.model_name, export=True
+        )
+        quantizer = ORTQuantizer.from_pretrained(model)
+        qconfig = AutoQuantizationConfig.avx512_vnni(
+            is_static=False, per_channel=False
+        )
+        quantizer.quantize(save_dir=self.model_dir, quantization_config=qconfig)
+        AutoTokenizer.from_pretrained(self.model_name).save_pretrained(self.model_dir)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts with mean pooling and L2 normalization.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feed = {
+                name: value.astype(np.int64)
+                for name, value in encoded.items()
+                if name in self._input_names
+            }
+            token_embeddings = self.session.run(None, feed)[0]
+
+            mask = encoded["attention_mask"][..., np.newaxis].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1)
+            pooled /= np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32, copy=False))
+
+        return np.concatenate(batches)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of documents.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embed a single query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Float32 query embedding
+        """
+        return self._encode([text])[0]
+
+
+class BatchingEmbedder:
+    """Micro-batch concurrent single-query embedding calls."""
+
+    def __init__(
+        self,
+        embeddings,
+        max_batch_size: int = 16,
+        max_wait: float = 0.01
+    ):
+        """
+        Initialize batching wrapper.
+
+        Args:
+            embeddings: Embedding model with embed_documents/embed_query
+            max_batch_size: Max number of queries embedded together
+            max_wait: Seconds to wait for more queries before embedding
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a list of documents directly, they are already a batch.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embed a single query, batched with concurrent callers.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Float32 query embedding
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _collect_batch(self) -> list:
+        """Block for one request, then gather more until full or timed out."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        """Worker loop: embed queued queries in batches."""
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -0,0 +1,467 @@
+"""
+Flat Index Module
+In-memory exact cosine search over a contiguous embedding matrix.
+"""
+
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from typing import List, Dict, Optional
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for lexical scoring."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index of NumPy posting lists."""
+
+    def __init__(self, documents: List[str] = (), k1: float = 1.5, b: float = 0.75):
+        """
+        Build the inverted index.
+
+        Args:
+            documents: Texts to index, row i is document i
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.num_docs = 0
+
+        # term -> (row arrays, tf arrays), one pair per add() until queried
+        self._postings: Dict[str, tuple] = {}
+        self._doc_len = np.zeros(0, dtype=np.float32)  # Grown geometrically
+        self._total_len = 0.0
+
+        self.add(documents)
+
+    def add(self, documents: List[str]):
+        """
+        Index documents as the next rows.
+
+        Args:
+            documents: Texts to append
+        """
+        if not documents:
+            return
+
+        needed = self.num_docs + len(documents)
+        if needed > len(self._doc_len):
+            doc_len = np.zeros(max(needed, 2 * len(self._doc_len)), dtype=np.float32)
+            doc_len[:self.num_docs] = self._doc_len[:self.num_docs]
+            self._doc_len = doc_len
+
+        postings: Dict[str, tuple] = {}
+        for row, text in enumerate(documents, start=self.num_docs):
+            counts = Counter(_tokenize(text))
+            self._doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                rows, tfs = postings.setdefault(term, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+
+        for term, (rows, tfs) in postings.items():
+            row_chunks, tf_chunks = self._postings.setdefault(term, ([], []))
+            row_chunks.append(np.asarray(rows, dtype=np.int64))
+            tf_chunks.append(np.asarray(tfs, dtype=np.float32))
+
+        self.num_docs = needed
+        self._total_len += float(self._doc_len[needed - len(documents):needed].sum())
+
+    def remove(self, keep: np.ndarray):
+        """
+        Drop every row not listed in keep and renumber the rest.
+
+        Args:
+            keep: Sorted indices of the rows to keep
+        """
+        new_rows = np.full(self.num_docs, -1, dtype=np.int64)
+        new_rows[keep] = np.arange(len(keep))
+
+        postings = {}
+        for term in self._postings:
+            rows, tfs = self._posting(term)
+            rows = new_rows[rows]
+            kept = rows >= 0
+            if kept.any():
+                postings[term] = ([rows[kept]], [tfs[kept]])
+
+        self._postings = postings
+        self._doc_len = self._doc_len[keep]
+        self.num_docs = len(keep)
+        self._total_len = float(self._doc_len.sum())
+
+    def _posting(self, term: str) -> Optional[tuple]:
+        """Rows and term frequencies of a term, merging appended chunks."""
+        chunks = self._postings.get(term)
+        if chunks is None:
+            return None
+        rows, tfs = chunks
+        if len(rows) > 1:
+            rows[:] = [np.concatenate(rows)]
+            tfs[:] = [np.concatenate(tfs)]
+        return rows[0], tfs[0]
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Score every document against a query.
+
+        Args:
+            query: Query text
+
+        Returns:
+            Float32 array of BM25 scores, zero for documents with no query term
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        avgdl = max(self._total_len / max(self.num_docs, 1), 1e-9)
+        for term in set(_tokenize(query)):
+            posting = self._posting(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log((self.num_docs - len(rows) + 0.5) / (len(rows) + 0.5) + 1)
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[rows] / avgdl)
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+
+class FlatIndex:
+    """Brute-force cosine index with structure-of-arrays layout."""
+
+    EMBEDDINGS_FILE = "emb.float32.npy"
+    CHUNKS_FILE = "chunks.jsonl"
+
+    def __init__(self, directory: str):
+        """
+        Initialize flat index, loading persisted data if present.
+
+        Args:
+            directory: Directory to persist the index in
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._emb_path = os.path.join(directory, self.EMBEDDINGS_FILE)
+        self._chunks_path = os.path.join(directory, self.CHUNKS_FILE)
+
+        # Row i < _size of _buf belongs to _ids[i], _docs[i] and _meta[i];
+        # rows past _size are spare capacity for appends
+        self._buf = np.empty((0, 0), dtype=np.float32)  # [capacity, D], L2-normalized
+        self._size = 0
+        self._ids: List[str] = []
+        self._docs: List[str] = []
+        self._meta: List[Dict] = []
+        self._bm25: Optional[BM25Index] = None  # Built on first hybrid search
+        self._lock = threading.Lock()
+        self._bm25_build_lock = threading.Lock()
+        self._generation = 0  # Bumped when existing rows change or move
+
+        # Changes not yet written to disk by flush()
+        self._pending_lines: List[str] = []  # Chunk records of appended rows
+        self._dirty = False
+        self._rewrite = True  # Chunk file must be rewritten, not appended to
+        self._flush_lock = threading.Lock()
+
+        self._load()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _emb(self) -> np.ndarray:
+        """Embedding rows in use, a view of the capacity buffer."""
+        return self._buf[:self._size]
+
+    def _load(self):
+        """Load embeddings and chunk sidecar from disk."""
+        if not (os.path.exists(self._emb_path) and os.path.exists(self._chunks_path)):
+            return
+
+        # Memory-map the matrix: startup is instant and the OS pages rows
+        # in lazily during the first search. Mutations replace it with an
+        # in-memory copy, so the mapped file is never written in place.
+        emb = np.load(self._emb_path, mmap_mode="r")
+        ids, docs, meta = [], [], []
+        with open(self._chunks_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record["id"])
+                docs.append(record["document"])
+                meta.append(record["metadata"])
+
+        if len(ids) == emb.shape[0]:
+            self._buf, self._size = emb, len(ids)
+            self._ids, self._docs, self._meta = ids, docs, meta
+            self._rewrite = False
+
+    @staticmethod
+    def _record(id_: str, doc: str, meta: Dict) -> str:
+        """Encode one chunk as a JSONL line."""
+        return json.dumps({"id": id_, "document": doc, "metadata": meta}) + "\n"
+
+    def flush(self):
+        """
+        Persist changes made since the last flush.
+
+        Appended chunks are appended to the chunk sidecar; deletes and
+        rebuilds rewrite it. The embedding matrix is replaced atomically.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                emb = self._emb
+                rewrite = self._rewrite
+                if rewrite:
+                    records = list(zip(self._ids, self._docs, self._meta))
+                lines = self._pending_lines
+                self._pending_lines = []
+                self._dirty = self._rewrite = False
+
+            try:
+                emb_tmp = self._emb_path + ".tmp"
+                with open(emb_tmp, "wb") as f:
+                    np.save(f, emb)
+
+                if rewrite:
+                    chunks_tmp = self._chunks_path + ".tmp"
+                    with open(chunks_tmp, "w", encoding="utf-8") as f:
+                        for record in records:
+                            f.write(self._record(*record))
+                    os.replace(emb_tmp, self._emb_path)
+                    os.replace(chunks_tmp, self._chunks_path)
+                else:
+                    os.replace(emb_tmp, self._emb_path)
+                    with open(self._chunks_path, "a", encoding="utf-8") as f:
+                        f.writelines(lines)
+            except BaseException:
+                with self._lock:
+                    self._dirty = self._rewrite = True
+                raise
+
+    def _mark_rewritten(self):
+        """Record a change that invalidates the on-disk chunk order."""
+        self._pending_lines = []
+        self._dirty = self._rewrite = True
+
+    def _reserve(self, rows: int, dim: int):
+        """Make room for rows more embeddings, growing capacity geometrically."""
+        needed = self._size + rows
+        if needed <= self._buf.shape[0]:
+            return
+        capacity = max(needed, 2 * self._buf.shape[0], 1024)
+        buf = np.empty((capacity, dim), dtype=np.float32)
+        if self._size:
+            buf[:self._size] = self._buf[:self._size]
+        self._buf = buf
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        """Return float32 rows scaled to unit length."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
+
+    def _matches(self, filter_dict: Optional[Dict]) -> np.ndarray:
+        """Boolean row mask for an equality metadata filter."""
+        if not filter_dict:
+            return np.ones(len(self._meta), dtype=bool)
+        return np.fromiter(
+            (all(meta.get(key) == value for key, value in filter_dict.items())
+             for meta in self._meta),
+            dtype=bool,
+            count=len(self._meta)
+        )
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict]
+    ):
+        """
+        Append chunks to the index; call flush() to persist them.
+
+        Args:
+            ids: Chunk ids
+            embeddings: Array of shape (len(ids), dim)
+            documents: Chunk texts
+            metadatas: Chunk metadata dicts
+        """
+        if not ids:
+            return
+
+        rows = self._normalize(embeddings)
+        lines = [self._record(*record) for record in zip(ids, documents, metadatas)]
+        with self._lock:
+            self._reserve(len(rows), rows.shape[1])
+            self._buf[self._size:self._size + len(rows)] = rows
+            # Extend in place: searches only read rows below their snapshot size
+            self._ids.extend(ids)
+            self._docs.extend(documents)
+            self._meta.extend(metadatas)
+            self._size += len(rows)
+            if self._bm25 is not None:
+                self._bm25.add(documents)
+            if not self._rewrite:
+                self._pending_lines.extend(lines)
+            self._dirty = True
+
+    def delete(self, filter_dict: Dict) -> int:
+        """
+        Remove chunks whose metadata matches the filter.
+
+        Args:
+            filter_dict: Equality metadata filter, e.g. {"source": "a.pdf"}
+
+        Returns:
+            Number of chunks removed
+        """
+        with self._lock:
+            remove = self._matches(filter_dict)
+            removed = int(remove.sum())
+            if removed == 0:
+                return 0
+
+            keep = np.flatnonzero(~remove)
+            self._buf = self._emb[keep]
+            self._size = len(keep)
+            self._ids = [self._ids[i] for i in keep]
+            self._docs = [self._docs[i] for i in keep]
+            self._meta = [self._meta[i] for i in keep]
+            if self._bm25 is not None:
+                self._bm25.remove(keep)
+            self._generation += 1
+            self._mark_rewritten()
+            return removed
+
+    def clear(self):
+        """Remove all chunks."""
+        with self._lock:
+            self._buf = np.empty((0, 0), dtype=np.float32)
+            self._size = 0
+            self._ids, self._docs, self._meta = [], [], []
+            self._bm25 = None
+            self._generation += 1
+            self._mark_rewritten()
+
+    def rebuild(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[Dict]
+    ):
+        """
+        Replace the whole index contents.
+
+        Args:
+            ids: Chunk ids
+            embeddings: Array of shape (len(ids), dim)
+            documents: Chunk texts
+            metadatas: Chunk metadata dicts
+        """
+        with self._lock:
+            if ids:
+                self._buf = self._normalize(embeddings)
+            else:
+                self._buf = np.empty((0, 0), dtype=np.float32)
+            self._size = len(ids)
+            self._ids = list(ids)
+            self._docs = list(documents)
+            self._meta = list(metadatas)
+            self._bm25 = None
+            self._generation += 1
+            self._mark_rewritten()
+
+    def _ensure_bm25(self):
+        """Build the BM25 index outside the search lock if it is missing."""
+        with self._bm25_build_lock:
+            while True:
+                with self._lock:
+                    if self._bm25 is not None:
+                        return
+                    docs, size, generation = self._docs, self._size, self._generation
+
+                bm25 = BM25Index(docs[:size])
+
+                with self._lock:
+                    if self._generation == generation:
+                        # Catch up with chunks appended during the build
+                        bm25.add(self._docs[size:self._size])
+                        self._bm25 = bm25
+                        return
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int = 5,
+        filter_dict: Dict = None,
+        query_text: Optional[str] = None,
+        prefilter_k: int = 200
+    ) -> List[Dict]:
+        """
+        Find the k most similar chunks.
+
+        With query_text, BM25 first narrows the search to the prefilter_k
+        best lexical matches, which are then reranked by cosine similarity.
+        Queries with fewer than k lexical matches use the full cosine scan.
+
+        Args:
+            query_embedding: Query embedding
+            k: Number of results to return
+            filter_dict: Optional equality metadata filter
+            query_text: Query text enabling the BM25 pre-filter
+            prefilter_k: Max lexical candidates passed to cosine reranking
+
+        Returns:
+            List of documents with metadata and cosine distance
+        """
+        if query_text:
+            self._ensure_bm25()
+
+        with self._lock:
+            emb, docs, meta = self._emb, self._docs, self._meta
+            mask = self._matches(filter_dict)
+            if query_text and len(emb) and self._bm25 is not None:
+                lexical = self._bm25.scores(query_text)
+            else:
+                lexical = None
+
+        candidates = np.flatnonzero(mask)
+        if lexical is not None:
+            hits = np.flatnonzero(mask & (lexical > 0))
+            if len(hits) > prefilter_k:
+                hits = hits[np.argpartition(-lexical[hits], prefilter_k - 1)[:prefilter_k]]
+            if len(hits) >= k:
+                candidates = hits
+
+        if len(candidates) == 0 or k <= 0:
+            return []
+
+        query = self._normalize(query_embedding)
+        if len(candidates) == len(emb):
+            scores = emb @ query
+        else:
+            scores = emb[candidates] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {
+                "content": docs[candidates[i]],
+                "metadata": meta[candidates[i]],
+                "distance": float(1.0 - scores[i])
+            }
+            for i in top
+        ]
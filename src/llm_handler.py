@@ -3,8 +3,28 @@ LLM Handler Module
 Handles Ollama integration for text generation.
 """
 
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Generator, Iterator
+
 import requests
-from typing import List, Dict, Generator
+import urllib3
+
+try:
+    import orjson
+    
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+    
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    
+    _json_loads = json.loads
 
 
 class OllamaLLM:
@@ -13,7 +33,11 @@ class OllamaLLM:
     def __init__(
         self,
         model: str = "llama3.2",
-        base_url: str = "http://localhost:11434"
+        base_url: str = "http://localhost:11434",
+        cache_size: int = 256,
+        cache_ttl: float = 3600.0,
+        keep_alive: str = "30m",
+        health_interval: float = 5.0
     ):
         """
         Initialize Ollama client.
@@ -21,11 +45,132 @@ class OllamaLLM:
         Args:
             model: Ollama model name
             base_url: Ollama server URL
+            cache_size: Max number of cached responses (0 disables caching)
+            cache_ttl: Seconds a cached response stays valid
+            keep_alive: How long Ollama keeps the model (and its prompt
+                KV cache) loaded between requests
+            health_interval: Seconds between background health checks
+                (0 disables the heartbeat and caching)
         """
         self.model = model
         self.base_url = base_url
         self.generate_url = f"{base_url}/api/generate"
         self.chat_url = f"{base_url}/api/chat"
+        self.keep_alive = keep_alive
+        self.options = {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "num_ctx": 2048
+        }
+        
+        # Keep-alive HTTP session shared by all callers and the heartbeat
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json"
+        
+        # Exact-match response cache: key -> (timestamp, response)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.corpus_version = 0
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Health status refreshed by a background heartbeat
+        self.health_interval = health_interval
+        self._healthy = False
+        self._health_checked_at = None
+        if health_interval > 0:
+            threading.Thread(target=self._heartbeat, daemon=True).start()
+    
+    def _post(self, payload: Dict, stream: bool = False) -> requests.Response:
+        """
+        POST a pre-serialized JSON payload to the generate endpoint.
+        
+        Args:
+            payload: Request body
+            stream: Whether to stream the response body
+            
+        Returns:
+            HTTP response
+        """
+        return self.session.post(
+            self.generate_url,
+            data=_json_dumps(payload),
+            stream=stream,
+            timeout=60
+        )
+    
+    @staticmethod
+    def _iter_ndjson(response: requests.Response) -> Iterator[Dict]:
+        """
+        Parse a newline-delimited JSON stream as data arrives.
+        
+        Args:
+            response: Streaming HTTP response
+            
+        Yields:
+            Decoded JSON objects
+        """
+        if hasattr(response.raw, "read1"):
+            blocks = iter(lambda: response.raw.read1(65536), b"")
+        else:
+            blocks = response.iter_content(chunk_size=None)
+        
+        pending = b""
+        for block in blocks:
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield _json_loads(line)
+        
+        if pending.strip():
+            yield _json_loads(pending)
+    
+    def _cache_key(self, prompt: str) -> str:
+        """
+        Build cache key for a prompt.
+        
+        Args:
+            prompt: Fully built prompt
+            
+        Returns:
+            SHA256 hex digest of model, corpus version, prompt and options
+        """
+        raw = "\0".join([
+            self.model,
+            str(self.corpus_version),
+            prompt,
+            json.dumps(self.options, sort_keys=True)
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _cache_get(self, key: str):
+        """Return cached response for key, or None if missing or expired."""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            
+            timestamp, response = entry
+            if time.monotonic() - timestamp > self.cache_ttl:
+                del self._cache[key]
+                return None
+            
+            self._cache.move_to_end(key)
+            return response
+    
+    def _cache_put(self, key: str, response: str):
+        """Store response under key, evicting least recently used entries."""
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), response)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def clear_cache(self):
+        """Drop all cached responses."""
+        with self._cache_lock:
+            self._cache.clear()
     
     def _build_prompt(self, query: str, context: List[str]) -> str:
         """
@@ -40,20 +185,22 @@ class OllamaLLM:
         """
         context_text = "\n\n".join([f"[{i+1}] {ctx}" for i, ctx in enumerate(context)])
         
+        # Static instructions come first so Ollama can reuse their KV cache
+        # across queries; only the documents and question need prefill.
         prompt = f"""You are a helpful AI assistant that answers questions based on provided documents.
 
-PROVIDED DOCUMENTS:
-{context_text}
-
-USER QUESTION: {query}
-
 INSTRUCTIONS:
-1. Answer ONLY using information from the provided documents above
+1. Answer ONLY using information from the provided documents below
 2. If the answer is not in the documents, clearly state "This information is not available in the provided documents"
 3. Be clear, concise, and accurate
 4. Cite which document section you used (e.g., "According to [1]...")
 5. If multiple document sections support your answer, combine them coherently
 
+PROVIDED DOCUMENTS:
+{context_text}
+
+USER QUESTION: {query}
+
 ANSWER:"""
         
         return prompt
@@ -81,31 +228,35 @@ ANSWER:"""
         else:
             prompt = query
         
+        # Serve repeated prompts from cache
+        use_cache = not stream and self.cache_size > 0
+        if use_cache:
+            key = self._cache_key(prompt)
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+        
         # Prepare request
         payload = {
             "model": self.model,
             "prompt": prompt,
             "stream": stream,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "num_ctx": 2048
-            }
+            "keep_alive": self.keep_alive,
+            "options": self.options
         }
         
         try:
-            response = requests.post(
-                self.generate_url,
-                json=payload,
-                timeout=60
-            )
+            response = self._post(payload, stream=stream)
             response.raise_for_status()
             
             if stream:
                 return response  # Return raw response for streaming
             else:
-                result = response.json()
-                return result.get("response", "")
+                result = _json_loads(response.content)
+                answer = result.get("response", "")
+                if use_cache:
+                    self._cache_put(key, answer)
+                return answer
         
         except requests.exceptions.RequestException as e:
             raise ConnectionError(f"Ollama bağlantı hatası: {str(e)}")
@@ -135,44 +286,75 @@ ANSWER:"""
             "model": self.model,
             "prompt": prompt,
             "stream": True,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "num_ctx": 2048
-            }
+            "keep_alive": self.keep_alive,
+            "options": self.options
         }
         
         try:
-            response = requests.post(
-                self.generate_url,
-                json=payload,
-                stream=True,
-                timeout=60
-            )
+            response = self._post(payload, stream=True)
             response.raise_for_status()
             
-            for line in response.iter_lines():
-                if line:
-                    import json
-                    data = json.loads(line)
-                    if "response" in data:
-                        yield data["response"]
+            for data in self._iter_ndjson(response):
+                if "response" in data:
+                    yield data["response"]
         
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
             raise ConnectionError(f"Ollama bağlantı hatası: {str(e)}")
     
-    def check_health(self) -> bool:
+    def preload(self) -> bool:
         """
-        Check if Ollama server is running.
+        Load the model into Ollama memory ahead of the first query.
         
         Returns:
-            True if server is accessible
+            True if the model was loaded
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self._post({"model": self.model, "keep_alive": self.keep_alive})
             return response.status_code == 200
-        except:
+        except requests.exceptions.RequestException:
             return False
+    
+    def _probe_health(self) -> bool:
+        """
+        Query Ollama and record whether it is reachable.
+        
+        Returns:
+            True if server is accessible
+        """
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
+            healthy = response.status_code == 200
+        except:
+            healthy = False
+        
+        self._healthy = healthy
+        self._health_checked_at = time.monotonic()
+        return healthy
+    
+    def _heartbeat(self):
+        """Background loop keeping the cached health status fresh."""
+        while True:
+            self._probe_health()
+            time.sleep(self.health_interval)
+    
+    def check_health(self) -> bool:
+        """
+        Check if Ollama server is running.
+        
+        Returns the heartbeat's cached status when it is recent, so UI
+        reruns do not block on an HTTP round-trip.
+        
+        Returns:
+            True if server is accessible
+        """
+        checked_at = self._health_checked_at
+        if (
+            checked_at is not None
+            and time.monotonic() - checked_at < 2 * self.health_interval
+        ):
+            return self._healthy
+        
+        return self._probe_health()
 
 
 if __name__ == "__main__":
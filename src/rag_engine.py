@@ -4,10 +4,15 @@ Orchestrates the complete RAG pipeline: document ingestion, retrieval, and gener
 """
 
 import os
-from typing import List, Dict, Optional
-from document_processor import DocumentProcessor
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Generator
+from document_processor import DocumentProcessor, FileInput
 from vector_store import VectorStore
 from llm_handler import OllamaLLM
+from semantic_cache import SemanticAnswerCache
 
 
 class RAGEngine:
@@ -18,7 +23,9 @@ class RAGEngine:
         ollama_model: str = "llama3.2",
         chunk_size: int = 500,
         chunk_overlap: int = 50,
-        max_context_chunks: int = 5
+        max_context_chunks: int = 5,
+        hybrid_search: bool = False,
+        ingest_batch_size: int = 32
     ):
         """
         Initialize RAG engine.
@@ -28,8 +35,15 @@ class RAGEngine:
             chunk_size: Document chunk size
             chunk_overlap: Overlap between chunks
             max_context_chunks: Max chunks to use for context
+            hybrid_search: Pre-filter retrieval candidates with BM25
+            ingest_batch_size: Chunks embedded per batch while ingesting
         """
         self.max_context_chunks = max_context_chunks
+        self.hybrid_search = hybrid_search
+        self.ingest_batch_size = ingest_batch_size
+        
+        # Bumped whenever the document set changes to invalidate caches
+        self.corpus_version = 0
         
         # Initialize components
         self.doc_processor = DocumentProcessor(
@@ -38,29 +52,140 @@ class RAGEngine:
         )
         self.vector_store = VectorStore()
         self.llm = OllamaLLM(model=ollama_model)
+        self.answer_cache = SemanticAnswerCache()
+    
+    def _bump_corpus_version(self):
+        """Invalidate cached answers after the document set changed."""
+        self.corpus_version += 1
+        self.llm.corpus_version = self.corpus_version
     
-    def ingest_document(self, file_path: str) -> Dict:
+    def _ingest_pipeline(self, files: List[FileInput]) -> List[int]:
+        """
+        Read, chunk, embed and store files as overlapping stages.
+        
+        One producer thread per file (up to the CPU count) streams chunks
+        into a bounded queue in batches; the calling thread embeds and
+        stores each batch as it arrives. Peak memory stays at a few
+        batches instead of whole documents.
+        
+        Args:
+            files: Paths to document files or binary file-like objects
+            
+        Returns:
+            Number of chunks stored per file
+        """
+        batches = queue.Queue(maxsize=4)
+        cancelled = threading.Event()
+        ingest_ids = [uuid.uuid4().hex for _ in files]
+        counts = [0] * len(files)
+        
+        def put(item) -> bool:
+            # Give up instead of blocking forever if the consumer failed
+            while not cancelled.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce(index: int):
+            try:
+                batch = []
+                documents = self.doc_processor.iter_documents(
+                    files[index], {"ingest_id": ingest_ids[index]}
+                )
+                for doc in documents:
+                    batch.append(doc)
+                    if len(batch) == self.ingest_batch_size:
+                        if not put((index, batch)):
+                            return
+                        batch = []
+                if batch:
+                    put((index, batch))
+            finally:
+                put(None)
+        
+        max_workers = min(len(files), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(produce, i) for i in range(len(files))]
+            try:
+                running = len(futures)
+                while running:
+                    item = batches.get()
+                    if item is None:
+                        running -= 1
+                        continue
+                    index, batch = item
+                    counts[index] += self.vector_store.add_documents(batch, flush=False)
+                
+                # Re-raise reader errors (e.g. unsupported or corrupt files)
+                for future in futures:
+                    future.result()
+            except BaseException:
+                cancelled.set()
+                for ingest_id in ingest_ids:
+                    self.vector_store.delete_where({"ingest_id": ingest_id})
+                raise
+            finally:
+                self.vector_store.flush()
+                self._bump_corpus_version()
+        
+        # Warm up the LLM so the first question skips model loading
+        threading.Thread(target=self.llm.preload, daemon=True).start()
+        
+        return counts
+    
+    def ingest_document(self, file_or_path: FileInput) -> Dict:
         """
         Ingest a document into the system.
         
         Args:
-            file_path: Path to document file
+            file_or_path: Path to document file or binary file-like object
             
         Returns:
             Ingestion statistics
         """
-        # Process and chunk document
-        chunks = self.doc_processor.process_and_chunk(file_path)
+        return self.ingest_documents([file_or_path])[0]
+    
+    def ingest_documents(self, file_paths: List[FileInput]) -> List[Dict]:
+        """
+        Ingest several documents, reading and chunking them in parallel.
         
-        # Add to vector store
-        num_added = self.vector_store.add_documents(chunks)
+        Args:
+            file_paths: Paths to document files or binary file-like objects
+            
+        Returns:
+            Ingestion statistics per file
+        """
+        if not file_paths:
+            return []
         
-        return {
-            "file_name": os.path.basename(file_path),
-            "chunks_created": len(chunks),
-            "chunks_stored": num_added,
-            "status": "success"
-        }
+        # Skip files whose exact content is already stored
+        digests = [self.doc_processor.file_digest(f) for f in file_paths]
+        new_files = {}  # digest -> index of the first file with that content
+        for i, digest in enumerate(digests):
+            if self.vector_store.get_file_record(digest) is None:
+                new_files.setdefault(digest, i)
+        
+        if new_files:
+            counts = self._ingest_pipeline([file_paths[i] for i in new_files.values()])
+            for (digest, i), count in zip(new_files.items(), counts):
+                file_name = self.doc_processor.get_file_name(file_paths[i])
+                self.vector_store.record_file(digest, file_name, count)
+        
+        results = []
+        for i, (file_path, digest) in enumerate(zip(file_paths, digests)):
+            chunks = self.vector_store.get_file_record(digest)["chunks"]
+            is_new = new_files.get(digest) == i
+            results.append({
+                "file_name": self.doc_processor.get_file_name(file_path),
+                "chunks_created": chunks,
+                "chunks_stored": chunks if is_new else 0,
+                "status": "success" if is_new else "duplicate"
+            })
+        
+        return results
     
     def query(
         self,
@@ -79,13 +204,31 @@ class RAGEngine:
         Returns:
             Response dict with answer and sources
         """
+        # Pin the corpus version before retrieval so answers are cached
+        # against the documents they were actually built from
+        corpus_version = self.corpus_version
+        
+        # Answer near-duplicate questions from cache
+        query_embedding = self.vector_store.embeddings.embed_query(question)
+        cached = self.answer_cache.lookup(
+            query_embedding, corpus_version, source_filter
+        )
+        if cached is not None:
+            return {
+                "answer": cached["answer"],
+                "sources": cached["sources"],
+                "stream": False
+            }
+        
         # Retrieve relevant chunks
         filter_dict = {"source": source_filter} if source_filter else None
         
         relevant_docs = self.vector_store.similarity_search(
             query=question,
             k=self.max_context_chunks,
-            filter_dict=filter_dict
+            filter_dict=filter_dict,
+            query_embedding=query_embedding,
+            hybrid=self.hybrid_search
         )
         
         # Extract context
@@ -102,18 +245,59 @@ class RAGEngine:
         if stream:
             # Return generator for streaming
             return {
-                "answer": self.llm.generate_stream(question, context),
+                "answer": self._cache_stream(
+                    self.llm.generate_stream(question, context),
+                    query_embedding,
+                    relevant_docs,
+                    corpus_version,
+                    source_filter
+                ),
                 "sources": relevant_docs,
                 "stream": True
             }
         else:
             answer = self.llm.generate(question, context)
+            self.answer_cache.store(
+                query_embedding, answer, relevant_docs,
+                corpus_version, source_filter
+            )
             return {
                 "answer": answer,
                 "sources": relevant_docs,
                 "stream": False
             }
     
+    def _cache_stream(
+        self,
+        chunks: Generator[str, None, None],
+        query_embedding: List[float],
+        sources: List[Dict],
+        corpus_version: int,
+        source_filter: Optional[str]
+    ) -> Generator[str, None, None]:
+        """
+        Pass through a streamed answer and cache it once complete.
+        
+        Args:
+            chunks: Streamed answer chunks
+            query_embedding: Question embedding
+            sources: Retrieved source chunks
+            corpus_version: Corpus version at retrieval time
+            source_filter: Source filter used for the query
+            
+        Yields:
+            Response chunks
+        """
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        
+        self.answer_cache.store(
+            query_embedding, "".join(parts), sources,
+            corpus_version, source_filter
+        )
+    
     def delete_document(self, source: str) -> int:
         """
         Delete a document from the system.
@@ -124,7 +308,9 @@ class RAGEngine:
         Returns:
             Number of chunks deleted
         """
-        return self.vector_store.delete_by_source(source)
+        num_deleted = self.vector_store.delete_by_source(source)
+        self._bump_corpus_version()
+        return num_deleted
     
     def list_documents(self) -> List[str]:
         """
@@ -133,16 +319,7 @@ class RAGEngine:
         Returns:
             List of unique source file names
         """
-        stats = self.vector_store.get_stats()
-        
-        # Get all unique sources
-        results = self.vector_store.collection.get()
-        
-        if not results['metadatas']:
-            return []
-        
-        sources = set(meta.get('source', 'Unknown') for meta in results['metadatas'])
-        return sorted(list(sources))
+        return self.vector_store.list_sources()
     
     def get_stats(self) -> Dict:
         """
@@ -160,6 +337,7 @@ class RAGEngine:
     def clear_all(self):
         """Clear all documents from the system."""
         self.vector_store.clear_all()
+        self._bump_corpus_version()
 
 
 if __name__ == "__main__":
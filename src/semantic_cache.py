@@ -0,0 +1,128 @@
+"""
+Semantic Cache Module
+Reuses answers for questions that are near-duplicates of earlier ones.
+"""
+
+import threading
+from typing import List, Dict, Optional
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Answer cache keyed by question embedding similarity."""
+
+    def __init__(self, threshold: float = 0.98, max_entries: int = 512):
+        """
+        Initialize semantic cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Max number of cached answers (oldest evicted first)
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.corpus_version = 0
+
+        # Unit-normalized question embeddings, one row per entry
+        self._questions: Optional[np.ndarray] = None
+        self._entries: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        """Convert embedding to a unit-length float32 vector."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _sync_version(self, corpus_version: int):
+        """Drop all entries if the document set changed."""
+        if corpus_version != self.corpus_version:
+            self._questions = None
+            self._entries = []
+            self.corpus_version = corpus_version
+
+    def lookup(
+        self,
+        embedding,
+        corpus_version: int,
+        source_filter: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Find a cached answer for a similar question.
+
+        Args:
+            embedding: Question embedding
+            corpus_version: Current corpus version of the caller
+            source_filter: Source filter used for the query
+
+        Returns:
+            Cached entry with answer and sources, or None on miss
+        """
+        with self._lock:
+            self._sync_version(corpus_version)
+            if self._questions is None:
+                return None
+
+            sims = self._questions @ self._normalize(embedding)
+            for idx in np.argsort(-sims):
+                if sims[idx] < self.threshold:
+                    break
+                entry = self._entries[idx]
+                if entry["source_filter"] == source_filter:
+                    return entry
+
+            return None
+
+    def store(
+        self,
+        embedding,
+        answer: str,
+        sources: List[Dict],
+        corpus_version: int,
+        source_filter: Optional[str] = None
+    ):
+        """
+        Cache an answer for a question.
+
+        Args:
+            embedding: Question embedding
+            answer: Generated answer
+            sources: Retrieved source chunks
+            corpus_version: Corpus version the answer was generated against
+            source_filter: Source filter used for the query
+        """
+        with self._lock:
+            if corpus_version < self.corpus_version:
+                return  # Answer was generated against an older corpus
+            self._sync_version(corpus_version)
+
+            row = self._normalize(embedding)[np.newaxis, :]
+            if self._questions is None:
+                self._questions = row
+            else:
+                self._questions = np.concatenate([self._questions, row])
+            self._entries.append({
+                "answer": answer,
+                "sources": sources,
+                "source_filter": source_filter
+            })
+
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._questions = self._questions[overflow:]
+                self._entries = self._entries[overflow:]
+
+    def clear(self):
+        """Drop all cached answers."""
+        with self._lock:
+            self._questions = None
+            self._entries = []
+
+
+if __name__ == "__main__":
+    # Test the cache
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], "answer", [], corpus_version=0)
+    print(f"Hit: {cache.lookup([0.999, 0.01], corpus_version=0)}")
+    print(f"Miss: {cache.lookup([0.0, 1.0], corpus_version=0)}")
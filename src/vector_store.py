@@ -4,10 +4,24 @@ Handles ChromaDB operations, embeddings, and similarity search.
 """
 
 import os
-from typing import List, Dict
+import json
+import hashlib
+import shelve
+import shutil
+import threading
+import uuid
+from collections import Counter
+from typing import List, Dict, Optional
+import numpy as np
 import chromadb
 from chromadb.config import Settings
-from langchain_huggingface import HuggingFaceEmbeddings
+from embeddings import (
+    BatchingEmbedder,
+    SentenceTransformerEmbeddings,
+    OnnxEmbeddings,
+    ONNX_AVAILABLE
+)
+from flat_index import FlatIndex
 
 
 class VectorStore:
@@ -16,7 +30,9 @@ class VectorStore:
     def __init__(
         self, 
         persist_directory: str = "./chroma_db",
-        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        quantize: bool = True,
+        flat_search_limit: int = 100_000
     ):
         """
         Initialize vector store.
@@ -24,15 +40,28 @@ class VectorStore:
         Args:
             persist_directory: Directory to persist ChromaDB data
             embedding_model: HuggingFace embedding model name
+            quantize: Use int8 ONNX Runtime embeddings when available
+            flat_search_limit: Max corpus size searched with the in-memory
+                flat index; larger corpora use Chroma's HNSW index
         """
         self.persist_directory = persist_directory
         self.embedding_model_name = embedding_model
+        self.flat_search_limit = flat_search_limit
         
-        # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=embedding_model,
-            model_kwargs={'device': 'cpu'}
-        )
+        # Initialize embeddings (concurrent queries are micro-batched)
+        if quantize and ONNX_AVAILABLE:
+            base_embeddings = OnnxEmbeddings(
+                model_name=embedding_model,
+                cache_dir=os.path.join(persist_directory, "onnx_models")
+            )
+            self.embedding_backend = "onnx-int8"
+        else:
+            base_embeddings = SentenceTransformerEmbeddings(
+                model_name=embedding_model,
+                device="cpu"
+            )
+            self.embedding_backend = "torch"
+        self.embeddings = BatchingEmbedder(base_embeddings)
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -45,13 +74,155 @@ class VectorStore:
             name="documents",
             metadata={"hnsw:space": "cosine"}
         )
+        
+        # Chunk count per source, kept in sync so listing never hits Chroma
+        results = self.collection.get(include=["metadatas"])
+        self._source_counts = Counter(
+            meta.get("source", "Unknown") for meta in results["metadatas"] or []
+        )
+        
+        # Exact in-memory index mirroring the collection, for small corpora;
+        # None while the collection is larger than flat_search_limit
+        self._flat_index_dir = os.path.join(persist_directory, "flat_index")
+        self.flat_index: Optional[FlatIndex] = None
+        self._sync_flat_index()
+        
+        # Digests of ingested files: digest -> {"source", "chunks"}
+        self._file_hashes_path = os.path.join(persist_directory, "file_hashes.json")
+        self._file_hashes = {}
+        if os.path.exists(self._file_hashes_path):
+            with open(self._file_hashes_path, "r", encoding="utf-8") as f:
+                self._file_hashes = json.load(f)
+        
+        # Persistent text -> embedding cache, survives restarts
+        self._emb_cache_path = os.path.join(persist_directory, "emb_cache.db")
+        self._emb_cache = shelve.open(self._emb_cache_path)
+        self._emb_cache_lock = threading.Lock()
+    
+    def _sync_flat_index(self):
+        """Load the flat index if the collection fits under the limit, else drop it."""
+        count = self.collection.count()
+        if count > self.flat_search_limit:
+            self._drop_flat_index()
+            return
+        
+        if self.flat_index is None:
+            self.flat_index = FlatIndex(self._flat_index_dir)
+        if len(self.flat_index) != count:
+            self._rebuild_flat_index()
+    
+    def _drop_flat_index(self):
+        """Free the flat index and its files; Chroma serves all searches."""
+        self.flat_index = None
+        shutil.rmtree(self._flat_index_dir, ignore_errors=True)
+    
+    def _delete_from_flat_index(self, where: Dict):
+        """Mirror a delete into the flat index, restoring it once the corpus fits."""
+        if self.flat_index is None:
+            self._sync_flat_index()
+        else:
+            self.flat_index.delete(where)
+            self.flat_index.flush()
+    
+    def _rebuild_flat_index(self):
+        """Reload the flat index from the Chroma collection."""
+        results = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        self.flat_index.rebuild(
+            ids=results["ids"],
+            embeddings=results["embeddings"],
+            documents=results["documents"],
+            metadatas=results["metadatas"]
+        )
+        self.flat_index.flush()
+    
+    def _save_file_hashes(self):
+        """Persist the file digest registry atomically."""
+        tmp_path = self._file_hashes_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._file_hashes, f)
+        os.replace(tmp_path, self._file_hashes_path)
+    
+    def get_file_record(self, digest: str) -> Optional[Dict]:
+        """
+        Look up a previously ingested file by content digest.
+        
+        Args:
+            digest: File content digest
+            
+        Returns:
+            Record with source and chunk count, or None if unknown
+        """
+        record = self._file_hashes.get(digest)
+        if record is None:
+            return None
+        if record["chunks"] and record["source"] not in self._source_counts:
+            return None  # Its chunks were removed since
+        return record
+    
+    def record_file(self, digest: str, source: str, chunks: int):
+        """
+        Remember an ingested file's content digest.
+        
+        Args:
+            digest: File content digest
+            source: Source file name
+            chunks: Number of chunks stored
+        """
+        self._file_hashes[digest] = {"source": source, "chunks": chunks}
+        self._save_file_hashes()
+    
+    def _embed_with_cache(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts, reusing cached embeddings for previously seen text.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Float32 array of shape (len(texts), dim)
+        """
+        namespace = f"{self.embedding_model_name}\0{self.embedding_backend}\0"
+        keys = [
+            hashlib.sha1((namespace + t).encode("utf-8")).hexdigest()
+            for t in texts
+        ]
+        
+        vectors = [None] * len(texts)
+        misses = []
+        with self._emb_cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._emb_cache.get(key)
+                if cached is None:
+                    misses.append(i)
+                else:
+                    vectors[i] = np.frombuffer(cached, dtype=np.float32)
+        
+        if misses:
+            # Embed each distinct missing text only once
+            pending = {}
+            for i in misses:
+                pending.setdefault(keys[i], texts[i])
+            new_vectors = self.embeddings.embed_documents(list(pending.values()))
+            
+            computed = {}
+            with self._emb_cache_lock:
+                for key, vector in zip(pending, new_vectors):
+                    self._emb_cache[key] = vector.tobytes()
+                    computed[key] = vector
+            
+            for i in misses:
+                vectors[i] = computed[keys[i]]
+        
+        return np.vstack(vectors)
     
-    def add_documents(self, documents: List[Dict]) -> int:
+    def add_documents(self, documents: List[Dict], flush: bool = True) -> int:
         """
         Add documents to vector store.
         
         Args:
             documents: List of document chunks with content and metadata
+            flush: Persist local indexes now; callers adding many batches
+                pass False and call flush() once at the end
             
         Returns:
             Number of documents added
@@ -59,13 +230,13 @@ class VectorStore:
         if not documents:
             return 0
         
-        # Generate embeddings
+        # Generate unit-length embeddings (cosine space)
         texts = [doc["content"] for doc in documents]
-        embeddings = self.embeddings.embed_documents(texts)
+        embeddings = self._embed_with_cache(texts)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
         
         # Prepare data for ChromaDB
-        ids = [f"doc_{i}_{doc['metadata'].get('chunk_id', i)}" 
-               for i, doc in enumerate(documents)]
+        ids = [uuid.uuid4().hex for _ in documents]
         
         metadatas = [doc["metadata"] for doc in documents]
         
@@ -76,14 +247,31 @@ class VectorStore:
             metadatas=metadatas,
             ids=ids
         )
+        if self.flat_index is not None:
+            if len(self.flat_index) + len(ids) > self.flat_search_limit:
+                self._drop_flat_index()
+            else:
+                self.flat_index.add(ids, embeddings, texts, metadatas)
+        self._source_counts.update(meta.get("source", "Unknown") for meta in metadatas)
+        if flush:
+            self.flush()
         
         return len(documents)
     
+    def flush(self):
+        """Persist pending changes of the local indexes and embedding cache."""
+        if self.flat_index is not None:
+            self.flat_index.flush()
+        with self._emb_cache_lock:
+            self._emb_cache.sync()
+    
     def similarity_search(
         self, 
         query: str, 
         k: int = 5,
-        filter_dict: Dict = None
+        filter_dict: Dict = None,
+        query_embedding: List[float] = None,
+        hybrid: bool = False
     ) -> List[Dict]:
         """
         Search for similar documents.
@@ -92,12 +280,24 @@ class VectorStore:
             query: Search query
             k: Number of results to return
             filter_dict: Optional metadata filter
+            query_embedding: Precomputed query embedding (skips embedding step)
+            hybrid: Pre-filter candidates with BM25 before cosine ranking
+                (flat index only)
             
         Returns:
             List of similar documents with metadata and scores
         """
         # Generate query embedding
-        query_embedding = self.embeddings.embed_query(query)
+        if query_embedding is None:
+            query_embedding = self.embeddings.embed_query(query)
+        
+        # Small corpora: one BLAS matrix-vector product beats HNSW + SQLite
+        flat_index = self.flat_index
+        if flat_index is not None:
+            return flat_index.search(
+                query_embedding, k, filter_dict,
+                query_text=query if hybrid else None
+            )
         
         # Search in collection
         results = self.collection.query(
@@ -128,16 +328,51 @@ class VectorStore:
         Returns:
             Number of documents deleted
         """
-        # Get all documents with this source
-        results = self.collection.get(
-            where={"source": source}
+        # Delete in one call; the count delta gives the number removed
+        before = self.collection.count()
+        self.collection.delete(where={"source": source})
+        self._delete_from_flat_index({"source": source})
+        self._source_counts.pop(source, None)
+        
+        self._file_hashes = {
+            digest: record for digest, record in self._file_hashes.items()
+            if record["source"] != source
+        }
+        self._save_file_hashes()
+        
+        return before - self.collection.count()
+    
+    def delete_where(self, where: Dict) -> int:
+        """
+        Delete all documents matching an equality metadata filter.
+        
+        Args:
+            where: Metadata filter, e.g. {"ingest_id": "..."}
+            
+        Returns:
+            Number of documents deleted
+        """
+        results = self.collection.get(where=where, include=["metadatas"])
+        if not results['ids']:
+            return 0
+        
+        self.collection.delete(ids=results['ids'])
+        self._delete_from_flat_index(where)
+        self._source_counts.subtract(
+            meta.get("source", "Unknown") for meta in results['metadatas']
         )
+        self._source_counts = +self._source_counts  # Drop emptied sources
         
-        if results['ids']:
-            self.collection.delete(ids=results['ids'])
-            return len(results['ids'])
+        return len(results['ids'])
+    
+    def list_sources(self) -> List[str]:
+        """
+        List unique document sources.
         
-        return 0
+        Returns:
+            Sorted list of source file names
+        """
+        return sorted(self._source_counts)
     
     def get_stats(self) -> Dict:
         """
@@ -151,6 +386,7 @@ class VectorStore:
         return {
             "total_documents": count,
             "embedding_model": self.embedding_model_name,
+            "embedding_backend": self.embedding_backend,
             "persist_directory": self.persist_directory
         }
     
@@ -162,6 +398,16 @@ class VectorStore:
             name="documents",
             metadata={"hnsw:space": "cosine"}
         )
+        if self.flat_index is not None:
+            self.flat_index.clear()
+            self.flat_index.flush()
+        self._sync_flat_index()
+        with self._emb_cache_lock:
+            self._emb_cache.close()
+            self._emb_cache = shelve.open(self._emb_cache_path, flag="n")
+        self._source_counts.clear()
+        self._file_hashes = {}
+        self._save_file_hashes()
 
 
 if __name__ == "__main__":